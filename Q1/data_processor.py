@@ -1,22 +1,33 @@
-import aiohttp
+import httpx
+import redis.asyncio as redis
 import asyncio
-import pandas as pd
 import json
+import orjson
 import time
 import os
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import (
+    create_engine, text, MetaData, Table, Column, BigInteger, Boolean, Float, Text, JSON,
+    table as table_clause, column as column_clause
+)
+from sqlalchemy.exc import DBAPIError, NoSuchTableError
 from sqlalchemy.pool import QueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from dotenv import load_dotenv
 import logging
 from logging.handlers import RotatingFileHandler
-from typing import List, Dict, Any, Optional, Tuple, Union
+from typing import List, Dict, Any, Optional, Tuple, Union, Iterable, Iterator, Callable
 import backoff
 import concurrent.futures
-from functools import partial
+from functools import partial, lru_cache
+from cachetools import TTLCache, cached
 import traceback
-import contextlib
 from prometheus_client import Counter, Histogram, start_http_server
 import socket
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import tempfile
+import hashlib
+from urllib.parse import urlsplit
 
 FETCH_COUNT = Counter('api_fetch_total', 'Total number of API fetch operations', ['api', 'status'])
 TRANSFORM_TIME = Histogram('transform_processing_seconds', 'Time spent transforming data', ['api'])
@@ -61,38 +72,155 @@ MYSQL_USERNAME = get_env_var("MYSQL_USERNAME", required=True)
 MYSQL_PASSWORD = get_env_var("MYSQL_PASSWORD", "")
 MYSQL_DB = get_env_var("MYSQL_DB", "data_processing")
 MYSQL_PORT = get_env_var("MYSQL_PORT", "3306")
-API_RATE_LIMIT = int(get_env_var("API_RATE_LIMIT", "10"))  # Requests per second
-WORKER_THREADS = int(get_env_var("WORKER_THREADS", "4"))
+API_RATE_LIMIT = int(get_env_var("API_RATE_LIMIT", "10"))  # Requests per second, per host
+API_MAX_CONNECTIONS = int(get_env_var("API_MAX_CONNECTIONS", "100"))
+API_MAX_CONNECTIONS_PER_HOST = int(get_env_var("API_MAX_CONNECTIONS_PER_HOST", "10"))
+MAX_RETRY_AFTER_SECONDS = 60
+WORKER_PROCESSES = int(get_env_var("WORKER_PROCESSES", str(os.cpu_count() or 1)))
 METRICS_PORT = int(get_env_var("METRICS_PORT", "8000"))
+MYSQL_COMPRESS = get_env_var("MYSQL_COMPRESS", "false").lower() == "true"
+REDIS_URL = get_env_var("REDIS_URL", "")
+API_CACHE_STALE_SECONDS = int(get_env_var("API_CACHE_STALE_SECONDS", "300"))
+TABLE_CACHE_TTL = int(get_env_var("TABLE_CACHE_TTL", "300"))
+
+DATABASE_URL = f"mysql+mysqldb://{MYSQL_USERNAME}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
+ASYNC_DATABASE_URL = f"mysql+asyncmy://{MYSQL_USERNAME}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
+
+INSERT_BATCH_SIZE = 10_000
+# Tables larger than this are bulk loaded with LOAD DATA LOCAL INFILE.
+LOAD_DATA_THRESHOLD = 50_000
+# Server/client refusals of LOCAL INFILE (local_infile=OFF is the MySQL 8 default).
+_LOCAL_INFILE_DISABLED_ERRORS = {1148, 2068, 3948}
+_TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"})
+
+# Marker for columns holding lists/dicts; they are stored in MySQL JSON columns.
+_JSON = "json"
+# Float(precision=53) renders as DOUBLE, matching what to_sql created for float columns.
+_SQL_TYPES = {bool: Boolean, int: BigInteger, float: Float(precision=53), _JSON: JSON}
 
-DATABASE_URL = f"mysql+pymysql://{MYSQL_USERNAME}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
+# Reflected schema shared by readers; refreshed only when store_data recreates a table.
+METADATA = MetaData()
+_table_reflected_at: Dict[str, float] = {}
 
-api_rate_limiter = None
+_DB_INITIALIZED = False
+_local_infile_disabled = False
 
-@contextlib.contextmanager
-def get_db_engine():
-    engine = create_engine(
+api_rate_limit = API_RATE_LIMIT
+api_rate_limiters: Dict[str, "TokenBucket"] = {}
+api_host_slots: Dict[str, asyncio.Semaphore] = {}
+_rate_limiters_loop: Optional[asyncio.AbstractEventLoop] = None
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_redis_client: Optional[redis.Redis] = None
+_redis_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_cache_refresh_tasks: Dict[str, asyncio.Task] = {}
+_async_engine: Optional[AsyncEngine] = None
+_async_engine_loop: Optional[asyncio.AbstractEventLoop] = None
+_process_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+@lru_cache(maxsize=None)
+def get_engine():
+    """Return the process-wide engine; its pool is shared by every caller."""
+    return create_engine(
         DATABASE_URL,
         poolclass=QueuePool,
         pool_pre_ping=True,
         pool_recycle=3600,
         pool_size=10,
         max_overflow=20,
-        connect_args={"connect_timeout": 30}
+        connect_args={"connect_timeout": 30, "compress": MYSQL_COMPRESS},
+        json_deserializer=orjson.loads
     )
-    try:
-        yield engine
-    finally:
-        engine.dispose()
+
+def dispose_engine():
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+        get_engine.cache_clear()
+
+def reflect_tables():
+    METADATA.reflect(get_engine())
+    now = time.monotonic()
+    for table_name in METADATA.tables:
+        _table_reflected_at[table_name] = now
+
+def get_table(table_name: str) -> Optional[Table]:
+    """Return the cached table, reflecting it on first use or once older than TABLE_CACHE_TTL.
+    
+    The TTL bounds how long a table recreated by another process (the
+    scheduler) is served with stale columns.
+    """
+    table = METADATA.tables.get(table_name)
+    if table is not None and time.monotonic() - _table_reflected_at.get(table_name, 0) > TABLE_CACHE_TTL:
+        _forget_table(table_name)
+        table = None
+    if table is None:
+        try:
+            table = Table(table_name, METADATA, autoload_with=get_engine())
+        except NoSuchTableError:
+            return None
+        _table_reflected_at[table_name] = time.monotonic()
+    return table
+
+def refresh_table(table_name: str) -> Optional[Table]:
+    """Drop the cached definition and reflect the table again."""
+    _forget_table(table_name)
+    return get_table(table_name)
+
+def _forget_table(table_name: str):
+    _table_reflected_at.pop(table_name, None)
+    table = METADATA.tables.get(table_name)
+    if table is not None:
+        METADATA.remove(table)
+
+def get_async_engine() -> AsyncEngine:
+    """Return the asyncmy engine used for ingestion on the running event loop."""
+    global _async_engine, _async_engine_loop
+    loop = asyncio.get_running_loop()
+    if _async_engine is None or _async_engine_loop is not loop:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            pool_size=10,
+            max_overflow=20,
+            # asyncmy has no protocol compression, so MYSQL_COMPRESS does not apply to ingestion.
+            connect_args={"connect_timeout": 30, "local_infile": True}
+        )
+        _async_engine_loop = loop
+    return _async_engine
+
+async def dispose_async_engine():
+    global _async_engine, _async_engine_loop
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_engine_loop = None
+
+def get_process_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=WORKER_PROCESSES)
+    return _process_pool
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
 
 def initialize_database():
+    """Create the database if needed; later calls return without touching the server."""
+    global _DB_INITIALIZED
+    if _DB_INITIALIZED:
+        return
     try:
-        base_url = f"mysql+pymysql://{MYSQL_USERNAME}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/"
+        base_url = f"mysql+mysqldb://{MYSQL_USERNAME}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/"
         base_engine = create_engine(base_url)
         
         with base_engine.connect() as conn:
             conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {MYSQL_DB}"))
             logger.info(f"Database {MYSQL_DB} initialized successfully")
+        _DB_INITIALIZED = True
     except Exception as e:
         logger.error(f"Database initialization failed: {str(e)}")
         raise
@@ -100,11 +228,42 @@ def initialize_database():
         if 'base_engine' in locals():
             base_engine.dispose()
 
+def _as_records(payload: Any) -> list:
+    if isinstance(payload, list):
+        return payload
+    if not isinstance(payload, dict):
+        raise TypeError(f"Unexpected data format: {type(payload)}")
+    for key in ['results', 'items', 'data']:
+        if isinstance(payload.get(key), list):
+            return payload[key]
+    return [payload]
+
+def _path_extractor(path: List[str]) -> Callable[[Any], list]:
+    def extract(payload: Any) -> list:
+        for key in path:
+            payload = payload[key]
+        return _as_records(payload)
+    return extract
+
+def _first_field_extractor(payload: Any) -> list:
+    data = payload['data']
+    return _as_records(data[next(iter(data))])
+
+def build_extractor(api_type: str, record_path: Optional[str] = None) -> Callable[[Any], list]:
+    """Resolve once where an API's records live in its response payload."""
+    if record_path:
+        return _path_extractor(record_path.split('.'))
+    if api_type == "GraphQL":
+        # Response keys follow the selection order, so the first one is the query's root field.
+        return _first_field_extractor
+    return _as_records
+
 class ApiConfig:
     def __init__(self, url: str, api_type: str, query: Optional[str] = None, 
                  label: Optional[str] = None, params: Optional[Dict] = None,
                  headers: Optional[Dict] = None, table_name: Optional[str] = None,
-                 retry_attempts: int = 3, timeout: int = 30):
+                 retry_attempts: int = 3, timeout: int = 30,
+                 cache_ttl: Optional[int] = 0, record_path: Optional[str] = None):
         self.url = url
         self.type = api_type  # REST or GraphQL
         self.query = query    # GraphQL query
@@ -114,6 +273,7 @@ class ApiConfig:
         self.table_name = table_name or self.label.lower().replace('.', '_').replace('-', '_')
         self.retry_attempts = retry_attempts
         self.timeout = timeout
+        self.cache_ttl = cache_ttl or 0  # Seconds a cached response stays fresh; 0 disables caching
         
         if not url:
             raise ValueError("URL is required for ApiConfig")
@@ -121,214 +281,501 @@ class ApiConfig:
             raise ValueError("api_type must be 'REST' or 'GraphQL'")
         if api_type == "GraphQL" and not query:
             raise ValueError("Query is required for GraphQL API")
+        
+        # Dotted path to the records, e.g. "data.characters.results"; inferred when omitted
+        self.record_path = record_path
+        self.extractor = build_extractor(api_type, record_path)
 
     def __str__(self):
         return f"ApiConfig({self.label}, {self.type})"
 
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP/2 client so connections and TLS sessions survive between runs."""
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=API_MAX_CONNECTIONS,
+                max_keepalive_connections=20,
+                keepalive_expiry=30.0
+            ),
+            timeout=httpx.Timeout(60.0),
+            verify=False
+        )
+        _http_client_loop = loop
+    return _http_client
+
+async def close_http_client():
+    global _http_client, _http_client_loop
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        _http_client_loop = None
+
+class TokenBucket:
+    """Async token bucket releasing `rate` tokens per second, holding at most `burst`."""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+def get_redis_client() -> Optional[redis.Redis]:
+    """Return the shared Redis client, or None when response caching is not configured."""
+    global _redis_client, _redis_client_loop
+    if not REDIS_URL:
+        return None
+    loop = asyncio.get_running_loop()
+    if _redis_client is None or _redis_client_loop is not loop:
+        _redis_client = redis.from_url(REDIS_URL)
+        _redis_client_loop = loop
+    return _redis_client
+
+async def close_redis_client():
+    global _redis_client, _redis_client_loop
+    if _redis_client is not None:
+        await _redis_client.aclose()
+        _redis_client = None
+        _redis_client_loop = None
+
+def _reset_limiters_if_loop_changed():
+    """Per-host limiters live for the event loop, shared by every run on it."""
+    global _rate_limiters_loop
+    loop = asyncio.get_running_loop()
+    if _rate_limiters_loop is not loop:
+        api_rate_limiters.clear()
+        api_host_slots.clear()
+        _rate_limiters_loop = loop
+
 async def init_rate_limiter(limit_per_second):
-    global api_rate_limiter
-    api_rate_limiter = asyncio.Semaphore(limit_per_second)
-
-@backoff.on_exception(
-    backoff.expo,
-    (aiohttp.ClientError, asyncio.TimeoutError),
-    max_tries=3,
-    jitter=backoff.full_jitter
-)
-async def fetch_data(session: aiohttp.ClientSession, api: ApiConfig) -> Tuple[ApiConfig, Any]:
-    global api_rate_limiter
-    start_time = time.time()
-    logger.info(f"Fetching data from {api.url}")
+    """Set the per-host rate; existing buckets are kept unless the rate changes."""
+    global api_rate_limit
+    _reset_limiters_if_loop_changed()
+    if limit_per_second != api_rate_limit:
+        api_rate_limit = limit_per_second
+        api_rate_limiters.clear()
+
+def get_rate_limiter(url: str) -> Optional[TokenBucket]:
+    """Return the token bucket for the URL's host so one slow API cannot starve another."""
+    if not api_rate_limit:
+        return None
+    _reset_limiters_if_loop_changed()
+    host = urlsplit(url).netloc
+    limiter = api_rate_limiters.get(host)
+    if limiter is None:
+        limiter = api_rate_limiters[host] = TokenBucket(api_rate_limit)
+    return limiter
+
+def get_host_slot(url: str) -> asyncio.Semaphore:
+    """Cap in-flight requests per host so fan-out to one API cannot take every connection.
     
+    Slots are shared by every run on the event loop, so concurrent runs
+    together stay within API_MAX_CONNECTIONS_PER_HOST.
+    """
+    _reset_limiters_if_loop_changed()
+    host = urlsplit(url).netloc
+    slot = api_host_slots.get(host)
+    if slot is None:
+        slot = api_host_slots[host] = asyncio.Semaphore(API_MAX_CONNECTIONS_PER_HOST)
+    return slot
+
+class RetryableHTTPError(Exception):
+    """A 429 or 5xx response that is worth retrying."""
+    
+    def __init__(self, url: str, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status_code} from {url}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+RETRYABLE_ERRORS = (httpx.TransportError, asyncio.TimeoutError, RetryableHTTPError)
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given as seconds or an HTTP date, capped at MAX_RETRY_AFTER_SECONDS."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
     try:
-        if api_rate_limiter:
-            async with api_rate_limiter:
-                return await _do_fetch(session, api)
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER_SECONDS)
+
+def _raise_for_retry(api: ApiConfig, response: httpx.Response):
+    if response.status_code == 429 or response.status_code >= 500:
+        logger.warning(f"Retryable API error {response.status_code} from {api.url}")
+        raise RetryableHTTPError(api.url, response.status_code, _retry_after_seconds(response))
+
+async def _fetch_attempt(client: httpx.AsyncClient, api: ApiConfig) -> Tuple[ApiConfig, Any]:
+    limiter = get_rate_limiter(api.url)
+    async with get_host_slot(api.url):
+        if limiter:
+            async with limiter:
+                return await _do_fetch(client, api)
         else:
-            return await _do_fetch(session, api)
+            return await _do_fetch(client, api)
+
+async def _fetch_live(client: httpx.AsyncClient, api: ApiConfig) -> Tuple[ApiConfig, Any]:
+    """Fetch with up to `api.retry_attempts` tries on network errors, 429 and 5xx; other 4xx fail at once.
+    
+    Between tries the server's Retry-After is honoured when given, otherwise
+    exponential backoff with full jitter is used. The last failure is not
+    followed by a wait.
+    """
+    logger.info(f"Fetching data from {api.url}")
+    max_tries = max(api.retry_attempts, 1)
+    
+    try:
+        for attempt in range(1, max_tries + 1):
+            try:
+                return await _fetch_attempt(client, api)
+            except RETRYABLE_ERRORS as e:
+                if attempt == max_tries:
+                    raise
+                retry_after = getattr(e, 'retry_after', None)
+                delay = retry_after if retry_after is not None else backoff.full_jitter(2 ** (attempt - 1))
+                logger.warning(f"Retrying {api.url} in {delay:.2f}s (attempt {attempt}/{max_tries}): {str(e)}")
+                await asyncio.sleep(delay)
     except Exception as e:
         FETCH_COUNT.labels(api=api.label, status='error').inc()
         logger.error(f"Failed to fetch data from {api.url}: {str(e)}")
         return api, None
 
-async def _do_fetch(session, api):
+def _cache_key(api: ApiConfig) -> str:
+    raw = api.url + (api.query or "") + json.dumps(api.params, sort_keys=True)
+    return f"api_cache:{hashlib.blake2b(raw.encode()).hexdigest()}"
+
+async def _read_cache(api: ApiConfig) -> Optional[Tuple[float, Any]]:
+    client = get_redis_client()
+    if client is None:
+        return None
+    try:
+        cached = await client.get(_cache_key(api))
+        if cached is None:
+            return None
+        entry = orjson.loads(cached)
+        return entry["fetched_at"], entry["data"]
+    except Exception as e:
+        logger.warning(f"Cache read failed for {api.url}: {str(e)}")
+        return None
+
+async def _write_cache(api: ApiConfig, data: Any):
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        entry = orjson.dumps({"fetched_at": time.time(), "data": data})
+        await client.setex(_cache_key(api), api.cache_ttl + API_CACHE_STALE_SECONDS, entry)
+    except Exception as e:
+        logger.warning(f"Cache write failed for {api.url}: {str(e)}")
+
+async def _refresh_cache(client: httpx.AsyncClient, api: ApiConfig):
+    _, data = await _fetch_live(client, api)
+    if data is not None:
+        await _write_cache(api, data)
+
+def _schedule_cache_refresh(client: httpx.AsyncClient, api: ApiConfig):
+    key = _cache_key(api)
+    if key in _cache_refresh_tasks:
+        return
+    task = asyncio.create_task(_refresh_cache(client, api))
+    _cache_refresh_tasks[key] = task
+    task.add_done_callback(lambda _: _cache_refresh_tasks.pop(key, None))
+
+async def fetch_data(client: httpx.AsyncClient, api: ApiConfig) -> Tuple[ApiConfig, Any]:
+    """Fetch an API response, serving it from Redis when the API opts into caching.
+    
+    Entries older than `cache_ttl` are still returned for up to
+    API_CACHE_STALE_SECONDS while a background fetch refreshes them.
+    """
+    if api.cache_ttl:
+        cached = await _read_cache(api)
+        if cached is not None:
+            fetched_at, data = cached
+            if time.time() - fetched_at > api.cache_ttl:
+                _schedule_cache_refresh(client, api)
+            FETCH_COUNT.labels(api=api.label, status='cached').inc()
+            logger.info(f"Serving cached response for {api.url}")
+            return api, data
+    
+    api, data = await _fetch_live(client, api)
+    if api.cache_ttl and data is not None:
+        await _write_cache(api, data)
+    return api, data
+
+async def _do_fetch(client: httpx.AsyncClient, api: ApiConfig):
     start_time = time.time()
     
     if api.type == "REST":
-        async with session.get(
+        response = await client.get(
             api.url, 
             params=api.params,
             headers=api.headers,
             timeout=api.timeout
-        ) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logger.error(f"API error {response.status} from {api.url}: {error_text}")
-                FETCH_COUNT.labels(api=api.label, status='error').inc()
-                return api, None
-            
-            data = await response.json()
-            logger.info(f"Successfully fetched data from {api.url} in {time.time() - start_time:.2f}s")
-            FETCH_COUNT.labels(api=api.label, status='success').inc()
-            return api, data
+        )
+        _raise_for_retry(api, response)
+        if response.status_code != 200:
+            logger.error(f"API error {response.status_code} from {api.url}: {response.text}")
+            FETCH_COUNT.labels(api=api.label, status='error').inc()
+            return api, None
+        
+        data = response.json()
+        logger.info(f"Successfully fetched data from {api.url} in {time.time() - start_time:.2f}s")
+        FETCH_COUNT.labels(api=api.label, status='success').inc()
+        return api, data
             
     elif api.type == "GraphQL":
-        async with session.post(
+        response = await client.post(
             api.url, 
             json={"query": api.query},
             headers=api.headers,
             timeout=api.timeout
-        ) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logger.error(f"GraphQL API error {response.status} from {api.url}: {error_text}")
-                FETCH_COUNT.labels(api=api.label, status='error').inc()
-                return api, None
-            
-            data = await response.json()
-            logger.info(f"Successfully fetched GraphQL data from {api.url} in {time.time() - start_time:.2f}s")
-            FETCH_COUNT.labels(api=api.label, status='success').inc()
-            return api, data
+        )
+        _raise_for_retry(api, response)
+        if response.status_code != 200:
+            logger.error(f"GraphQL API error {response.status_code} from {api.url}: {response.text}")
+            FETCH_COUNT.labels(api=api.label, status='error').inc()
+            return api, None
+        
+        data = response.json()
+        logger.info(f"Successfully fetched GraphQL data from {api.url} in {time.time() - start_time:.2f}s")
+        FETCH_COUNT.labels(api=api.label, status='success').inc()
+        return api, data
+
+def flatten(record: Dict, prefix: str = "", out: Optional[Dict] = None) -> Dict:
+    """Flatten nested dicts into dot-joined keys, matching pd.json_normalize."""
+    if out is None:
+        out = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flatten(value, f"{name}.", out)
+        else:
+            out[name] = value
+    return out
 
-def transform_data(raw_data: Any, api_config: ApiConfig) -> List[Dict]:
+def flatten_records(records: List[Dict]) -> List[Dict]:
+    """Flatten a batch of records; module-level so it can run in a worker process."""
+    return [flatten(record) for record in records]
+
+async def transform_data(raw_data: Any, api_config: ApiConfig) -> List[Dict]:
     with TRANSFORM_TIME.labels(api=api_config.label).time():
         if not raw_data:
             logger.warning(f"No data to transform for {api_config.url}")
             return []
         
         try:
-            if api_config.type == "GraphQL":
-                if 'data' in raw_data:
-                    if 'characters' in raw_data.get('data', {}):
-                        raw_data = raw_data['data']['characters']['results']
-                    elif 'countries' in raw_data.get('data', {}):
-                        raw_data = raw_data['data']['countries']
-                    else:
-                        first_key = next(iter(raw_data['data']), None)
-                        if first_key:
-                            raw_data = raw_data['data'][first_key]
-            
-            if not isinstance(raw_data, (list, dict)):
-                logger.error(f"Unexpected data format for {api_config.url}: {type(raw_data)}")
-                return []
-            
-            if isinstance(raw_data, dict):
-                for key in ['results', 'items', 'data']:
-                    if key in raw_data and isinstance(raw_data[key], list):
-                        raw_data = raw_data[key]
-                        break
-                else:
-                    raw_data = [raw_data]
-            
-            df = pd.json_normalize(raw_data)
-            
-            df = df.where(pd.notnull(df), None)
-            
-            return df.to_dict(orient='records')
+            records = api_config.extractor(raw_data)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_process_pool(), flatten_records, records)
         except Exception as e:
             logger.error(f"Error transforming data for {api_config.url}: {str(e)}")
             logger.error(f"Traceback: {traceback.format_exc()}")
             return []
 
-def store_data(data: List[Dict], api_config: ApiConfig, engine) -> bool:
+def _infer_column_types(data: List[Dict]) -> Dict[str, Any]:
+    """Resolve every key to a single column type in one pass over the rows."""
+    column_types: Dict[str, Any] = {}
+    for row in data:
+        for key, value in row.items():
+            if value is None:
+                column_types.setdefault(key, None)
+                continue
+            value_type = _JSON if isinstance(value, (list, dict)) else type(value)
+            seen = column_types.get(key)
+            if seen is value_type:
+                continue
+            if seen is None:
+                column_types[key] = value_type
+            elif _JSON in (seen, value_type):
+                column_types[key] = _JSON
+            elif {seen, value_type} <= {int, float}:
+                column_types[key] = float
+            else:
+                column_types[key] = str
+    return column_types
+
+def _build_table(table_name: str, column_types: Dict[str, Any]) -> Table:
+    return Table(
+        table_name,
+        MetaData(),
+        *[Column(name, _SQL_TYPES.get(col_type, Text)) for name, col_type in column_types.items()]
+    )
+
+def _insert_statement(table: Table):
+    """INSERT without bind processing, since JSON values are already encoded."""
+    return table_clause(table.name, *[column_clause(c.name) for c in table.columns]).insert()
+
+def _prepare_rows(data: Iterable[Dict], column_types: Dict[str, Any]) -> Iterator[Dict]:
+    """Give every row the full column set and JSON-encode list/dict columns.
+    
+    Rows are produced lazily so callers only hold one batch of encoded rows
+    alongside the input at a time.
+    """
+    columns = list(column_types)
+    json_columns = [name for name, col_type in column_types.items() if col_type is _JSON]
+    for row in data:
+        prepared = {name: row.get(name) for name in columns}
+        for name in json_columns:
+            value = prepared[name]
+            if value is not None:
+                prepared[name] = orjson.dumps(value).decode()
+        yield prepared
+
+def _tsv_field(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value).translate(_TSV_ESCAPES)
+
+def _write_tsv(tsv_file, rows: Iterable[Dict]) -> None:
+    for row in rows:
+        tsv_file.write("\t".join(_tsv_field(value) for value in row.values()))
+        tsv_file.write("\n")
+    tsv_file.flush()
+
+async def _load_data_infile(conn, table: Table, rows: Iterable[Dict]) -> None:
+    """Stream rows to the server as a TSV file parsed by LOAD DATA LOCAL INFILE."""
+    quote = conn.dialect.identifier_preparer.quote
+    columns = ", ".join(quote(column.name) for column in table.columns)
+    
+    with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', newline='', suffix='.tsv') as tsv_file:
+        await asyncio.get_running_loop().run_in_executor(None, _write_tsv, tsv_file, rows)
+        
+        await conn.exec_driver_sql(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {quote(table.name)} CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({columns})",
+            (tsv_file.name,)
+        )
+
+async def _try_load_data_infile(conn, table: Table, rows: Iterable[Dict]) -> bool:
+    """Bulk load rows, returning False when LOCAL INFILE is disabled so callers can fall back."""
+    global _local_infile_disabled
+    if _local_infile_disabled:
+        return False
+    try:
+        await _load_data_infile(conn, table, rows)
+        return True
+    except DBAPIError as e:
+        error_code = e.orig.args[0] if e.orig is not None and e.orig.args else None
+        if error_code not in _LOCAL_INFILE_DISABLED_ERRORS:
+            raise
+        _local_infile_disabled = True
+        logger.warning(f"LOAD DATA LOCAL INFILE is disabled ({error_code}); "
+                       "falling back to batched inserts for large tables")
+        return False
+
+async def store_data(data: List[Dict], api_config: ApiConfig, engine: AsyncEngine) -> bool:
     with STORAGE_TIME.labels(api=api_config.label, status='processing').time():
         if not data:
             logger.info(f"Skipping storage for empty table: {api_config.table_name}")
             return False
         
         try:
-            df = pd.DataFrame(data)
-            
-            for col in df.columns:
-                if df[col].apply(lambda x: isinstance(x, (list, dict))).any():
-                    df[col] = df[col].apply(lambda x: json.dumps(x) if x is not None else None)
-            
-            inspector = inspect(engine)
-            
-            if_exists = 'replace' if api_config.table_name in inspector.get_table_names() else 'append'
+            column_types = _infer_column_types(data)
+            table = _build_table(api_config.table_name, column_types)
             
-            chunk_size = 1000
-            total_rows = len(df)
+            total_rows = len(data)
+            total_chunks = (total_rows - 1) // INSERT_BATCH_SIZE + 1
             
-            for i in range(0, total_rows, chunk_size):
-                chunk = df.iloc[i:i+chunk_size]
-                chunk.to_sql(
-                    name=api_config.table_name,
-                    con=engine,
-                    if_exists='append' if i > 0 else if_exists,
-                    index=False,
-                    method='multi'
+            async with engine.begin() as conn:
+                await conn.run_sync(table.drop, checkfirst=True)
+                await conn.run_sync(table.create)
+                insert = _insert_statement(table)
+                
+                bulk_loaded = total_rows > LOAD_DATA_THRESHOLD and await _try_load_data_infile(
+                    conn, table, _prepare_rows(data, column_types)
                 )
-                logger.info(f"Stored chunk {i//chunk_size + 1}/{(total_rows-1)//chunk_size + 1} " +
-                           f"({len(chunk)} rows) in table '{api_config.table_name}'")
+                if bulk_loaded:
+                    logger.info(f"Bulk loaded {total_rows} rows into table '{api_config.table_name}'")
+                else:
+                    for i in range(0, total_rows, INSERT_BATCH_SIZE):
+                        chunk = list(_prepare_rows(data[i:i+INSERT_BATCH_SIZE], column_types))
+                        await conn.execute(insert, chunk)
+                        logger.info(f"Stored chunk {i//INSERT_BATCH_SIZE + 1}/{total_chunks} " +
+                                   f"({len(chunk)} rows) in table '{api_config.table_name}'")
             
+            _forget_table(table.name)
+            table.to_metadata(METADATA)
+            _table_reflected_at[table.name] = time.monotonic()
             ROWS_PROCESSED.labels(api=api_config.label).inc(total_rows)
             STORAGE_TIME.labels(api=api_config.label, status='success').observe(0)
             return True
         except Exception as e:
+            _forget_table(api_config.table_name)
             logger.error(f"Storage failed for {api_config.table_name}: {str(e)}")
             logger.error(f"Traceback: {traceback.format_exc()}")
             STORAGE_TIME.labels(api=api_config.label, status='error').observe(0)
             return False
 
-def process_data_in_thread_pool(api_config: ApiConfig, raw_data: Any) -> int:
+async def process_data(api_config: ApiConfig, raw_data: Any) -> int:
     logger.info(f"Processing data for {api_config.table_name}")
     
     try:
-        transformed_data = transform_data(raw_data, api_config)
+        transformed_data = await transform_data(raw_data, api_config)
         if transformed_data:
-            with get_db_engine() as engine:
-                success = store_data(transformed_data, api_config, engine)
-                if success:
-                    return len(transformed_data)
+            success = await store_data(transformed_data, api_config, get_async_engine())
+            if success:
+                return len(transformed_data)
         return 0
     except Exception as e:
-        logger.error(f"Error in data processing thread for {api_config.table_name}: {str(e)}")
+        logger.error(f"Error processing data for {api_config.table_name}: {str(e)}")
         return 0
 
+async def fetch_and_process(client: httpx.AsyncClient, api: ApiConfig) -> Tuple[ApiConfig, Optional[int]]:
+    """Store each API as soon as its fetch completes, overlapping with slower fetches."""
+    api_config, raw_data = await fetch_data(client, api)
+    if not raw_data:
+        return api_config, None
+    return api_config, await process_data(api_config, raw_data)
+
 async def process_apis(apis: List[ApiConfig]) -> Dict[str, int]:
     logger.info(f"Starting data processing for {len(apis)} APIs")
     
     initialize_database()
     
-    await init_rate_limiter(API_RATE_LIMIT)
-    
-    timeout = aiohttp.ClientTimeout(total=60)
-    connector = aiohttp.TCPConnector(limit=10, ssl=False)
-    
+    client = get_http_client()
     results = {}
     
-    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-        tasks = [fetch_data(session, api) for api in apis]
-        api_results = await asyncio.gather(*tasks, return_exceptions=True)
+    tasks = [fetch_and_process(client, api) for api in apis]
+    api_results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    for result in api_results:
+        if isinstance(result, Exception):
+            logger.error(f"API processing failed with exception: {str(result)}")
+            continue
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=WORKER_THREADS) as executor:
-            futures = []
-            
-            for result in api_results:
-                if isinstance(result, Exception):
-                    logger.error(f"API fetch failed with exception: {str(result)}")
-                    continue
-                    
-                api_config, raw_data = result
-                if raw_data:
-                    future = executor.submit(
-                        process_data_in_thread_pool,
-                        api_config,
-                        raw_data
-                    )
-                    futures.append((api_config, future))
-            
-            for api_config, future in futures:
-                try:
-                    row_count = future.result()
-                    results[api_config.label] = row_count
-                except Exception as e:
-                    logger.error(f"Processing failed for {api_config.label}: {str(e)}")
-                    results[api_config.label] = 0
-            
-            total_rows = sum(results.values())
-            logger.info(f"Completed processing {total_rows} rows across all APIs")
+        api_config, row_count = result
+        if row_count is not None:
+            results[api_config.label] = row_count
+    
+    total_rows = sum(results.values())
+    logger.info(f"Completed processing {total_rows} rows across all APIs")
     
     return results
 
@@ -339,7 +786,9 @@ def start_metrics_server():
     except Exception as e:
         logger.error(f"Failed to start metrics server: {str(e)}")
 
+@cached(TTLCache(maxsize=1, ttl=5))
 def health_check() -> Dict[str, Any]:
+    """Check database connectivity; results are cached for 5s to keep probes cheap."""
     health_status = {
         "status": "healthy",
         "timestamp": time.time(),
@@ -348,10 +797,9 @@ def health_check() -> Dict[str, Any]:
     }
     
     try:
-        with get_db_engine() as engine:
-            with engine.connect() as conn:
-                result = conn.execute(text("SELECT 1")).fetchone()
-                health_status["checks"]["database"] = "connected" if result else "error"
+        with get_engine().connect() as conn:
+            result = conn.execute(text("SELECT 1")).fetchone()
+            health_status["checks"]["database"] = "connected" if result else "error"
     except Exception as e:
         health_status["checks"]["database"] = f"error: {str(e)}"
         health_status["status"] = "unhealthy"
@@ -393,7 +841,8 @@ if __name__ == "__main__":
             url="https://countries.trevorblades.com/graphql",
             api_type="GraphQL",
             query="query { countries { name capital currency } }",
-            label="countries"
+            label="countries",
+            cache_ttl=86400
         )
     ]
     
@@ -1,40 +1,58 @@
 from fastapi import FastAPI, HTTPException, Depends, Query, Path, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import APIKeyHeader
-from sqlalchemy import create_engine, text, MetaData, Table, select, inspect
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import create_engine, text, Table, select, func
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, ProgrammingError
+from cachetools import TTLCache
 from pydantic import BaseModel, Field
-import pandas as pd
 import os
-import json
+import orjson
+import itertools
+from decimal import Decimal
 import logging
 from typing import Dict, List, Optional, Any
 from data_processor import (
-    setup_logger, get_env_var, get_db_engine, health_check,
-    DATABASE_URL, ApiConfig, process_apis
+    setup_logger, get_env_var, get_engine, dispose_engine, reflect_tables,
+    get_table, refresh_table, close_http_client,
+    close_redis_client, dispose_async_engine, shutdown_process_pool, health_check,
+    initialize_database,
+    DATABASE_URL, MYSQL_DB, ApiConfig, process_apis
 )
 import asyncio
 import uvicorn
+import uvloop
 import time
 from datetime import datetime
 from prometheus_client import Counter, Histogram
 
 logger = setup_logger('api_server', 'logs/api_server.log')
 
+asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 REQUEST_COUNT = Counter('api_requests_total', 'Total number of API requests', ['endpoint', 'method', 'status'])
 REQUEST_LATENCY = Histogram('api_request_latency_seconds', 'API request latency', ['endpoint'])
 
 app = FastAPI(
     title="Data Processing API",
     description="API for accessing processed data from various sources",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
 API_KEY = get_env_var("API_KEY", "")
+STREAM_BATCH_SIZE = 200
+
+# Row totals for paginated reads; slightly stale counts are fine for pagination metadata.
+row_count_cache = TTLCache(maxsize=128, ttl=30)
+
+TABLE_ROWS_QUERY = text(
+    "SELECT TABLE_NAME, TABLE_ROWS FROM information_schema.TABLES "
+    "WHERE TABLE_SCHEMA = :schema AND TABLE_TYPE = 'BASE TABLE'"
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -74,11 +92,89 @@ async def add_process_time_header(request: Request, call_next):
         ).inc()
         REQUEST_LATENCY.labels(endpoint=endpoint).observe(process_time)
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"detail": "Internal server error"}
         )
 
+@app.on_event("startup")
+async def startup():
+    try:
+        initialize_database()
+        reflect_tables()
+    except Exception as e:
+        logger.error(f"Database setup failed at startup: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_http_client()
+    await close_redis_client()
+    await dispose_async_engine()
+    dispose_engine()
+    shutdown_process_pool()
+
+def get_row_count(conn, table: Table) -> int:
+    count = row_count_cache.get(table.name)
+    if count is None:
+        count = conn.execute(select(func.count()).select_from(table)).scalar()
+        row_count_cache[table.name] = count
+    return count
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+def stream_rows(conn, partitions, response_metadata: Dict[str, Any]):
+    """Yield the JSON response body batch by batch from an already executed server-side cursor."""
+    try:
+        yield b'{"data":['
+        separator = b""
+        for partition in partitions:
+            batch = orjson.dumps([row._asdict() for row in partition], default=_json_default)
+            yield separator + batch[1:-1]
+            separator = b","
+        yield b'],"metadata":' + orjson.dumps(response_metadata) + b'}'
+    except Exception as e:
+        logger.error(f"Error streaming rows: {str(e)}")
+        raise
+    finally:
+        conn.close()
+
+def open_page(table: Table, limit: int, offset: int, sort_by: Optional[str], sort_order: str):
+    """Execute a page query and fetch its first batch before any response is sent.
+    
+    Execution errors therefore surface as a 500 rather than a truncated 200.
+    Returns the open connection, the row total and the row batches.
+    """
+    if sort_by and sort_by not in table.c:
+        raise HTTPException(status_code=400, detail=f"Sort column '{sort_by}' not found")
+
+    # LIMIT/OFFSET are rendered as bound parameters, so the compiled
+    # statement is cached per table and sort column.
+    query = select(table)
+    if sort_by:
+        column = table.c[sort_by]
+        query = query.order_by(column.asc() if sort_order.lower() == "asc" else column.desc())
+        
+    query = query.limit(limit).offset(offset)
+    
+    conn = get_engine().connect()
+    try:
+        total_count = get_row_count(conn, table)
+        result = conn.execution_options(
+            stream_results=True, yield_per=STREAM_BATCH_SIZE
+        ).execute(query)
+        partitions = result.partitions()
+        first_partition = next(partitions, None)
+    except Exception:
+        conn.close()
+        raise
+    
+    if first_partition is not None:
+        partitions = itertools.chain([first_partition], partitions)
+    return conn, total_count, partitions
+
 async def verify_api_key(api_key: str = Depends(api_key_header)):
     if not API_KEY or api_key == API_KEY:
         return api_key
@@ -95,30 +191,41 @@ async def root():
 
 @app.get("/health", tags=["Health"])
 async def check_health():
-    """Health check endpoint."""
-    return health_check()
+    """Liveness check; does not touch the database."""
+    return {"status": "alive", "timestamp": time.time()}
+
+@app.get("/ready", tags=["Health"])
+async def check_ready():
+    """Readiness check backed by the cached database health check."""
+    health_status = health_check()
+    if health_status["status"] != "healthy":
+        return ORJSONResponse(status_code=503, content=health_status)
+    return health_status
 
 @app.get("/tables", dependencies=[Depends(verify_api_key)], tags=["Data"])
 async def list_tables():
+    """List tables with their columns.
+    
+    Row counts come from information_schema.TABLES.TABLE_ROWS in a single
+    query; for InnoDB this is an estimate, not an exact COUNT(*).
+    """
     try:
-        with get_db_engine() as engine:
-            inspector = inspect(engine)
-            tables = inspector.get_table_names()
-            
-            result = {}
-            for table in tables:
-                try:
-                    with engine.connect() as conn:
-                        count = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
-                        result[table] = {
-                            "row_count": count,
-                            "columns": [col["name"] for col in inspector.get_columns(table)]
-                        }
-                except SQLAlchemyError as e:
-                    logger.error(f"Error getting info for table {table}: {str(e)}")
-                    result[table] = {"error": str(e)}
-            
-            return {"tables": result}
+        with get_engine().connect() as conn:
+            table_rows = conn.execute(TABLE_ROWS_QUERY, {"schema": MYSQL_DB}).all()
+        
+        result = {}
+        for table_name, row_count in table_rows:
+            try:
+                table = get_table(table_name)
+                result[table_name] = {
+                    "row_count": row_count,
+                    "columns": table.c.keys() if table is not None else []
+                }
+            except SQLAlchemyError as e:
+                logger.error(f"Error getting info for table {table_name}: {str(e)}")
+                result[table_name] = {"error": str(e)}
+        
+        return {"tables": result}
     except Exception as e:
         logger.error(f"Error listing tables: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -132,56 +239,32 @@ async def get_table_data(
     sort_order: str = Query("asc", description="Sort order (asc or desc)")
 ):
     try:
-        with get_db_engine() as engine:
-            inspector = inspect(engine)
-            
-            if table_name not in inspector.get_table_names():
+        table = get_table(table_name)
+        if table is None:
+            raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found")
+        
+        try:
+            conn, total_count, partitions = open_page(table, limit, offset, sort_by, sort_order)
+        except (OperationalError, ProgrammingError) as e:
+            # The scheduler may have recreated the table since it was reflected.
+            logger.warning(f"Re-reflecting table {table_name} after query error: {str(e)}")
+            row_count_cache.pop(table_name, None)
+            table = refresh_table(table_name)
+            if table is None:
                 raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found")
-            
-            valid_columns = [col["name"] for col in inspector.get_columns(table_name)]
-            if sort_by and sort_by not in valid_columns:
-                raise HTTPException(status_code=400, detail=f"Sort column '{sort_by}' not found")
-
-            query = f"SELECT * FROM {table_name}"
-            if sort_by:
-                sort_direction = "ASC" if sort_order.lower() == "asc" else "DESC"
-                query += f" ORDER BY {sort_by} {sort_direction}"
-                
-            query += f" LIMIT {limit} OFFSET {offset}"
-            
-            with engine.connect() as conn:
-                result = conn.execute(text(query))
-                rows = result.fetchall()
-                
-                total_count = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
-                
-            column_names = result.keys()
-            data = []
-            for row in rows:
-                item = dict(zip(column_names, row))
-                
-                for key, value in item.items():
-                    if isinstance(value, str) and (
-                        (value.startswith('{') and value.endswith('}')) or 
-                        (value.startswith('[') and value.endswith(']'))
-                    ):
-                        try:
-                            item[key] = json.loads(value)
-                        except json.JSONDecodeError:
-                            pass
-                            
-                data.append(item)
-            
-            return {
-                "data": data,
-                "metadata": {
-                    "total": total_count,
-                    "limit": limit,
-                    "offset": offset,
-                    "sort_by": sort_by,
-                    "sort_order": sort_order
-                }
-            }
+            conn, total_count, partitions = open_page(table, limit, offset, sort_by, sort_order)
+        
+        # JSON columns are decoded by the column type, so rows serialize as-is.
+        return StreamingResponse(
+            stream_rows(conn, partitions, {
+                "total": total_count,
+                "limit": limit,
+                "offset": offset,
+                "sort_by": sort_by,
+                "sort_order": sort_order
+            }),
+            media_type="application/json"
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -214,3 +297,5 @@ async def trigger_processing(request: ProcessRequest):
         logger.error(f"Error triggering processing: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
 
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(get_env_var("API_PORT", "8080")), loop="uvloop")
@@ -1,5 +1,3 @@
-import schedule
-import time
 import asyncio
 import datetime
 import os
@@ -7,20 +5,15 @@ import signal
 import json
 import logging
 from logging.handlers import RotatingFileHandler
-from data_processor import ApiConfig, process_apis, setup_logger
+import uvloop
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from data_processor import (
+    ApiConfig, process_apis, close_http_client, close_redis_client,
+    dispose_async_engine, shutdown_process_pool, initialize_database, setup_logger
+)
 
 logger = setup_logger('scheduler', 'scheduler.log')
 
-running = True
-
-def signal_handler(sig, frame):
-    global running
-    logger.info("Shutdown signal received, stopping scheduler...")
-    running = False
-
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
-
 def load_api_configs():
     try:
         if os.path.exists('api_config.json'):
@@ -60,14 +53,15 @@ def load_api_configs():
                     url="https://countries.trevorblades.com/graphql",
                     api_type="GraphQL",
                     query="query { countries { name capital currency } }",
-                    label="countries"
+                    label="countries",
+                    cache_ttl=86400
                 )
             ]
     except Exception as e:
         logger.error(f"Error loading API configurations: {str(e)}")
         return []
 
-def run_data_processing_job():
+async def run_data_processing_job():
     logger.info("Starting scheduled data processing job")
     apis = load_api_configs()
     
@@ -76,30 +70,59 @@ def run_data_processing_job():
         return
     
     try:
-        asyncio.run(process_apis(apis))
+        await process_apis(apis)
         logger.info("Data processing job completed successfully")
     except Exception as e:
         logger.error(f"Data processing job failed: {str(e)}")
 
-def schedule_jobs(interval_minutes=60):
+def schedule_jobs(scheduler, interval_minutes=60):
     logger.info(f"Scheduling data processing job to run every {interval_minutes} minutes")
-    schedule.every(interval_minutes).minutes.do(run_data_processing_job)
-    
-    logger.info("Running initial data processing job")
-    run_data_processing_job()
+    # Coalesced, single-instance runs: a slow job delays the next tick instead of overlapping it.
+    scheduler.add_job(
+        run_data_processing_job,
+        'interval',
+        minutes=interval_minutes,
+        coalesce=True,
+        max_instances=1,
+        next_run_time=datetime.datetime.now()
+    )
+    logger.info("Initial data processing job will run immediately")
 
-def run_scheduler():
-    global running
-    
+async def close_resources():
+    await close_http_client()
+    await close_redis_client()
+    await dispose_async_engine()
+    shutdown_process_pool()
+
+async def run_scheduler():
+    """Run jobs on one long-lived event loop so HTTP, Redis and DB pools persist between ticks."""
     logger.info("Starting scheduler service")
     
-    schedule_jobs()
+    stop_event = asyncio.Event()
+    
+    def signal_handler():
+        logger.info("Shutdown signal received, stopping scheduler...")
+        stop_event.set()
+    
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGINT, signal_handler)
+    loop.add_signal_handler(signal.SIGTERM, signal_handler)
+    
+    try:
+        initialize_database()
+    except Exception as e:
+        logger.error(f"Database initialization failed, will retry on first job: {str(e)}")
+    
+    scheduler = AsyncIOScheduler()
+    schedule_jobs(scheduler)
+    scheduler.start()
     
-    while running:
-        schedule.run_pending()
-        time.sleep(1)
+    await stop_event.wait()
     
+    scheduler.shutdown(wait=False)
+    await close_resources()
     logger.info("Scheduler service shut down")
 
 if __name__ == "__main__":
-    run_scheduler()
\ No newline at end of file
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(run_scheduler())